@@ -1,39 +1,177 @@
 import os
 import difflib
+import hashlib
+import platform
 import re
+import shelve
+import sys
+import threading
 import tkinter as tk
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk, messagebox, filedialog
 from pathlib import Path
 
-IGNORED_DIRS_DEFAULT = {
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+IGNORED_DIRS_DEFAULT = frozenset(map(sys.intern, {
     ".git", ".svn", ".hg", "__pycache__", "build", "dist", "out",
     ".idea", ".vscode", ".vs", ".gradle", ".dart_tool", "node_modules",
     ".cache", ".pytest_cache", "target"
-}
+}))
 
 # ------------------------------------------------------
 # Syntax Highlighting Rules
 # ------------------------------------------------------
+# Keys double as Text tag names. Order is match priority, so comments and
+# strings come before keywords like a real lexer would.
 HIGHLIGHT_RULES = {
     "python": {
-        "keywords": r"\b(False|class|finally|is|return|None|continue|for|lambda|try|True|def|from|nonlocal|while|and|del|global|not|with|as|elif|if|or|yield|assert|else|import|pass|break|except|in|raise)\b",
-        "strings": r"(\"[^\"]*\"|'[^']*')",
-        "comments": r"#.*",
-        "numbers": r"\b\d+(\.\d+)?\b",
+        "comment": r"#.*",
+        "string": r"(\"[^\"]*\"|'[^']*')",
+        "keyword": r"\b(False|class|finally|is|return|None|continue|for|lambda|try|True|def|from|nonlocal|while|and|del|global|not|with|as|elif|if|or|yield|assert|else|import|pass|break|except|in|raise)\b",
+        "number": r"\b\d+(\.\d+)?\b",
     },
     "dart": {
-        "keywords": r"\b(abstract|else|import|super|as|enum|in|switch|assert|export|interface|sync|await|extends|is|this|break|external|library|throw|case|factory|mixin|true|catch|false|new|try|class|final|null|typedef|const|finally|on|var|continue|for|operator|void|covariant|get|part|while|default|hide|rethrow|with|deferred|if|return|yield|do|implements|set|dynamic|static)\b",
-        "strings": r"(\"[^\"]*\"|'[^']*')",
-        "comments": r"//.*|/\*[\s\S]*?\*/",
-        "numbers": r"\b\d+(\.\d+)?\b",
+        "comment": r"//.*|/\*[\s\S]*?\*/",
+        "string": r"(\"[^\"]*\"|'[^']*')",
+        "keyword": r"\b(abstract|else|import|super|as|enum|in|switch|assert|export|interface|sync|await|extends|is|this|break|external|library|throw|case|factory|mixin|true|catch|false|new|try|class|final|null|typedef|const|finally|on|var|continue|for|operator|void|covariant|get|part|while|default|hide|rethrow|with|deferred|if|return|yield|do|implements|set|dynamic|static)\b",
+        "number": r"\b\d+(\.\d+)?\b",
     },
     "html": {
-        "tags": r"</?[\w\-]+(?:\s+[\w\-]+(?:=(?:\"[^\"]*\"|'[^']*'|[^\s>]+))?)*\s*/?>",
-        "strings": r"(\"[^\"]*\"|'[^']*')",
-        "comments": r"<!--[\s\S]*?-->",
+        "comment": r"<!--[\s\S]*?-->",
+        "tag": r"</?[\w\-]+(?:\s+[\w\-]+(?:=(?:\"[^\"]*\"|'[^']*'|[^\s>]+))?)*\s*/?>",
+        "string": r"(\"[^\"]*\"|'[^']*')",
     }
 }
 
+# One alternation per language so each file is scanned once; match.lastgroup is the tag
+HIGHLIGHT_PATTERNS = {
+    lang: re.compile('|'.join(f'(?P<{tag}>{pattern})' for tag, pattern in rules.items()), re.MULTILINE)
+    for lang, rules in HIGHLIGHT_RULES.items()
+}
+
+HASH_CHUNK_SIZE = 64 * 1024
+BINARY_SNIFF_SIZE = 8192
+SCAN_WORKERS = (os.cpu_count() or 1) * 4
+HIGHLIGHT_DELAY_MS = 50
+# Lines scanned beyond each viewport edge so comments/strings crossing it still pair up
+HIGHLIGHT_MARGIN_LINES = 200
+LINE_BAG_THRESHOLD = 5000
+MAX_KEPT_CHARS = 1_000_000
+# Session-wide cap on kept contents; the kept line lists roughly double the footprint
+MAX_KEPT_TOTAL_CHARS = 50_000_000
+# (c1, c2, lines1, lines2) placeholder for pairs whose contents weren't kept
+NOT_LOADED = (None, None, None, None)
+CACHE_DIR = Path.home() / ".cache" / "delivryz"
+
+def file_digest(path):
+    """Stream a file through BLAKE2b so identical files never need decoding"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.digest()
+
+def is_binary(path):
+    """NUL bytes near the start mean the file isn't text worth decoding and diffing"""
+    with open(path, 'rb') as f:
+        return b'\0' in f.read(BINARY_SNIFF_SIZE)
+
+def line_starts(content):
+    """Offsets at which each line of content begins"""
+    starts = [0]
+    i = content.find('\n')
+    while i != -1:
+        starts.append(i + 1)
+        i = content.find('\n', i + 1)
+    return starts
+
+def offset_to_index(starts, offset, first_line=1):
+    """Turn a character offset into a "line.col" Text index Tk can parse directly"""
+    line = bisect_right(starts, offset) - 1
+    return f"{line + first_line}.{offset - starts[line]}"
+
+# ------------------------------------------------------
+# LCS Kernel
+# ------------------------------------------------------
+IS_PYPY = platform.python_implementation() == 'PyPy'
+
+# The LCS kernel compares lines as 32-bit hashes: a contiguous uint32 buffer touches far
+# less memory than str pointers, and a 2**-32 collision per line can't move a change ratio.
+# Only the ratio uses them; diff highlighting compares the lines themselves.
+# PyPy keeps plain int lists, which its JIT handles better than numpy arrays.
+if np is not None and not IS_PYPY:
+    def line_hashes(lines):
+        return np.fromiter((hash(l) & 0xFFFFFFFF for l in lines), np.uint32, len(lines))
+else:
+    def line_hashes(lines):
+        return [hash(l) & 0xFFFFFFFF for l in lines]
+
+def lcs_len_py(a, b):
+    """Longest common subsequence length, rolling 1D dp in plain loops so PyPy's JIT can trace it"""
+    m = len(b)
+    dp = [0] * (m + 1)
+    for i in range(len(a)):
+        ai = a[i]
+        diag = 0
+        for j in range(1, m + 1):
+            up = dp[j]
+            if ai == b[j - 1]:
+                dp[j] = diag + 1
+            elif dp[j - 1] > up:
+                dp[j] = dp[j - 1]
+            diag = up
+    return dp[m]
+
+# PyPy JITs the pure version; CPython needs numba for it to beat SequenceMatcher,
+# so without numba lcs_len stays None and the SequenceMatcher path is used.
+if IS_PYPY:
+    lcs_len = lcs_len_py
+elif njit is not None:
+    @njit(cache=True, nogil=True)
+    def lcs_len(a, b):
+        """Same dp as lcs_len_py over uint32 arrays"""
+        m = len(b)
+        dp = np.zeros(m + 1, np.int32)
+        for i in range(len(a)):
+            ai = a[i]
+            diag = 0
+            for j in range(1, m + 1):
+                up = dp[j]
+                if ai == b[j - 1]:
+                    dp[j] = diag + 1
+                elif dp[j - 1] > up:
+                    dp[j] = dp[j - 1]
+                diag = up
+        return dp[m]
+else:
+    lcs_len = None
+
+# Stored with every cached verdict: bump the number whenever the significance rules change.
+# The backend is included since the LCS kernel and SequenceMatcher.ratio() can disagree.
+CACHE_VERSION = f"1-{'pypy' if IS_PYPY else 'numba' if lcs_len is not None else 'difflib'}"
+
+def common_affix(lines1, lines2):
+    """Return (prefix, suffix): how many leading and trailing lines the two lists share"""
+    n = min(len(lines1), len(lines2))
+    prefix = 0
+    while prefix < n and lines1[prefix] == lines2[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < n - prefix and lines1[-1 - suffix] == lines2[-1 - suffix]:
+        suffix += 1
+    return prefix, suffix
+
 class DiffViewer:
     def __init__(self, root, dir1: str, dir2: str, min_change_threshold=0.05):
         self.root = root
@@ -48,9 +186,20 @@ class DiffViewer:
         self.original_left = ""
         self.original_right = ""
         self.min_change_threshold = min_change_threshold  # 5% minimum change by default
+        self.current_lang = None
+        self.highlight_jobs = {}
+        # shelve is not thread-safe and compare_pair runs on the scan pool
+        self.cache = self.open_cache()
+        self.cache_lock = threading.Lock()
+        self.kept_chars = 0
+        self.kept_lock = threading.Lock()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.setup_dark_theme()
         self.setup_ui()
+        # Pay the JIT cost once here rather than inside the scan workers
+        if lcs_len is not None:
+            lcs_len(line_hashes(['']), line_hashes(['']))
         self.scan_directories()
         if self.file_pairs:
             self.load_file_pair(0)
@@ -117,7 +266,10 @@ class DiffViewer:
         scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
         scroll_x = ttk.Scrollbar(frame, orient=tk.HORIZONTAL)
         scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
-        text = tk.Text(frame, wrap=tk.NONE, yscrollcommand=scroll_y.set,
+        def on_yscroll(first, last):
+            scroll_y.set(first, last)
+            self.schedule_highlight(text)
+        text = tk.Text(frame, wrap=tk.NONE, yscrollcommand=on_yscroll,
                        xscrollcommand=scroll_x.set, background=self.text_bg,
                        foreground=self.text_fg, insertbackground="white",
                        font=("Consolas", 11), undo=True)
@@ -132,13 +284,16 @@ class DiffViewer:
         text.tag_config('comment', foreground='#6a9955')
         text.tag_config('number', foreground='#b5cea8')
         text.tag_config('tag', foreground='#569cd6')
+        text.bind('<Configure>', lambda e: self.schedule_highlight(text))
         return text
 
     # ------------------------------------------------------
     # Core Logic
     # ------------------------------------------------------
-    def has_significant_changes(self, content1, content2):
-        """Check if two files have significant differences (more than threshold)"""
+    def has_significant_changes(self, content1, content2, lines1=None, lines2=None):
+        """Check if two files have significant differences (more than threshold).
+        Callers are expected to have already ruled out identical contents, and may pass
+        content.splitlines() they already hold to avoid splitting again."""
         # Always consider it significant if one file is empty and the other isn't
         if (not content1 and content2) or (not content2 and content1):
             return True
@@ -146,100 +301,257 @@ class DiffViewer:
         # If both are empty or very small, not significant
         if not content1 and not content2:
             return False
-        
-        lines1 = content1.splitlines()
-        lines2 = content2.splitlines()
-        
+
+        # Compare line content only, so a missing final newline isn't a changed line
+        if lines1 is None:
+            lines1 = content1.splitlines()
+        if lines2 is None:
+            lines2 = content2.splitlines()
+        return self.has_significant_changes_lines(lines1, lines2)
+
+    def has_significant_changes_lines(self, lines1, lines2):
         # If line count difference is large, it's significant
         max_lines = max(len(lines1), len(lines2))
         if max_lines == 0:
             return False
-        
-        # Count actual differences
-        diff = list(difflib.Differ().compare(lines1, lines2))
-        changed_lines = sum(1 for line in diff if line.startswith('+ ') or line.startswith('- '))
-        
-        # Calculate change ratio
-        change_ratio = changed_lines / max_lines
-        
+        # At least |len1 - len2| lines were added or removed, so this alone can accept
+        if abs(len(lines1) - len(lines2)) / max_lines >= self.min_change_threshold:
+            return True
+
+        # Giant files: compare line multisets in linear time instead of sequence matching.
+        # Moved lines count as unchanged here, which is fine for a threshold gate.
+        if max_lines > LINE_BAG_THRESHOLD:
+            counter1, counter2 = Counter(lines1), Counter(lines2)
+            changed = sum((counter1 - counter2).values()) + sum((counter2 - counter1).values())
+            return changed / max_lines >= self.min_change_threshold
+
+        # Similarity ratios only need the matching blocks, not a full Differ edit script.
+        # 1 - ratio() is changed / (len1 + len2); scaling by (len1 + len2) / max_lines gives
+        # the Differ-style changed / max_lines. real_quick_ratio() and quick_ratio() are
+        # cheap upper bounds on ratio(), so a large enough change against either is conclusive.
+        scale = (len(lines1) + len(lines2)) / max_lines
+        sm = difflib.SequenceMatcher(None, lines1, lines2, autojunk=True)
+        if (1.0 - sm.real_quick_ratio()) * scale >= self.min_change_threshold:
+            return True
+        if (1.0 - sm.quick_ratio()) * scale >= self.min_change_threshold:
+            return True
+
+        # Calculate change ratio, with the compiled LCS kernel when available
+        if lcs_len is not None:
+            common = lcs_len(line_hashes(lines1), line_hashes(lines2))
+            change_ratio = (len(lines1) + len(lines2) - 2 * common) / max_lines
+        else:
+            change_ratio = (1.0 - sm.ratio()) * scale
+
         # Return True if change ratio exceeds threshold
         return change_ratio >= self.min_change_threshold
 
+    def compare_pair(self, task):
+        """Return the (f1, f2, rel, c1, c2, lines1, lines2) entry if it should be shown,
+        otherwise None. Contents and lines are only kept when the scan decoded the pair."""
+        f1, f2, rel = task
+        loaded = NOT_LOADED
+        # If one file is missing, it's a significant difference
+        if f1 is None or f2 is None:
+            return task + loaded
+        # If both files exist, compare their content
+        try:
+            st1 = os.stat(f1)
+            st2 = os.stat(f2)
+            # Unchanged files keep their verdict from earlier runs. One entry per pair, so a
+            # changed file overwrites its old verdict instead of adding a new key.
+            key = f"{os.path.abspath(f1)}|{os.path.abspath(f2)}|{self.min_change_threshold}"
+            stamp = (st1.st_mtime_ns, st1.st_size, st2.st_mtime_ns, st2.st_size, CACHE_VERSION)
+            significant = self.cache_get(key, stamp)
+            if significant is None:
+                significant, loaded = self.is_pair_significant(f1, f2, st1.st_size, st2.st_size)
+                self.cache_put(key, stamp, significant)
+        except Exception:
+            # If we can't read the files, assume they're different
+            return task + NOT_LOADED
+        return task + loaded if significant else None
+
+    def is_pair_significant(self, f1, f2, size1, size2):
+        """Return (significant, (c1, c2, lines1, lines2)); the second item is
+        NOT_LOADED unless the files were decoded and are small enough to keep"""
+        # Sizes can only prove identity, never significance: one long added line changes
+        # the byte count a lot but is a single changed line against the line threshold.
+        # Same size and same digest means identical, skip the decode
+        if size1 == size2 and file_digest(f1) == file_digest(f2):
+            return False, NOT_LOADED
+        # Past this point the bytes are known to differ; binary files are significant as-is
+        if is_binary(f1) or is_binary(f2):
+            return True, NOT_LOADED
+        content1 = Path(f1).read_text(encoding='utf-8', errors='ignore')
+        content2 = Path(f2).read_text(encoding='utf-8', errors='ignore')
+        # Identical files never reach the significance check
+        if content1 == content2:
+            return False, NOT_LOADED
+        # Split once; the same lists are kept for highlight_diff on load
+        lines1 = content1.splitlines()
+        lines2 = content2.splitlines()
+        significant = self.has_significant_changes(content1, content2, lines1, lines2)
+        # Keep the decoded pair for load_file_pair while it and the session total fit the budget;
+        # anything else is re-read on demand
+        if (significant and max(len(content1), len(content2)) < MAX_KEPT_CHARS
+                and self.reserve_kept(len(content1) + len(content2))):
+            return significant, (content1, content2, lines1, lines2)
+        return significant, NOT_LOADED
+
+    def reserve_kept(self, chars):
+        """Claim room for kept contents under MAX_KEPT_TOTAL_CHARS; scan workers call this concurrently"""
+        with self.kept_lock:
+            if self.kept_chars + chars > MAX_KEPT_TOTAL_CHARS:
+                return False
+            self.kept_chars += chars
+            return True
+
+    # ------------------------------------------------------
+    # Significance Cache
+    # ------------------------------------------------------
+    def open_cache(self):
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            return shelve.open(str(CACHE_DIR / "diffcache"))
+        except Exception:
+            # Run uncached rather than fail when the cache is unavailable
+            return None
+
+    def cache_get(self, key, stamp):
+        """Cached verdict for key, or None if missing or stored under a different stamp"""
+        if self.cache is None:
+            return None
+        with self.cache_lock:
+            entry = self.cache.get(key)
+        if entry is None or entry[:-1] != stamp:
+            return None
+        return entry[-1]
+
+    def cache_put(self, key, stamp, significant):
+        if self.cache is None:
+            return
+        with self.cache_lock:
+            self.cache[key] = stamp + (significant,)
+
+    def on_close(self):
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        self.root.destroy()
+
     def scan_directories(self):
         files1 = self.list_files(self.dir1)
         files2 = self.list_files(self.dir2)
         all_paths = sorted(set(files1.keys()) | set(files2.keys()))
-        for rel in all_paths:
-            f1 = files1.get(rel)
-            f2 = files2.get(rel)
-            # If one file is missing, it's a significant difference
-            if f1 is None or f2 is None:
-                self.file_pairs.append((f1, f2, rel))
-                continue
-            # If both files exist, compare their content
-            try:
-                content1 = Path(f1).read_text(encoding='utf-8', errors='ignore')
-                content2 = Path(f2).read_text(encoding='utf-8', errors='ignore')
-                # Only add if contents are different AND significantly different
-                if content1 != content2 and self.has_significant_changes(content1, content2):
-                    self.file_pairs.append((f1, f2, rel))
-            except Exception:
-                # If we can't read the files, assume they're different
-                self.file_pairs.append((f1, f2, rel))
-        
-        self.file_combo['values'] = [str(rp) for _, _, rp in self.file_pairs]
+        tasks = [(files1.get(rel), files2.get(rel), rel) for rel in all_paths]
+        # stat/read release the GIL, so threads overlap the disk I/O of many pairs
+        with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as ex:
+            for pair in ex.map(self.compare_pair, tasks):
+                if pair is not None:
+                    self.file_pairs.append(pair)
+        if self.cache is not None:
+            self.cache.sync()
+
+        self.file_combo['values'] = [str(pair[2]) for pair in self.file_pairs]
         if self.file_pairs:
             self.file_combo.current(0)
             self.update_status()
 
     def list_files(self, base: Path):
+        """Map relative path strings to full paths, pruning ignored dirs before descending"""
         result = {}
-        for root, dirs, files in os.walk(base):
-            dirs[:] = [d for d in dirs if d not in IGNORED_DIRS_DEFAULT]
-            for f in files:
-                p = Path(root) / f
-                try:
-                    result[p.relative_to(base)] = p
-                except Exception:
-                    pass
+        base_str = os.fspath(base)
+        prefix_len = len(os.path.join(base_str, ''))
+        stack = [base_str]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in IGNORED_DIRS_DEFAULT:
+                                stack.append(entry.path)
+                        elif entry.is_file():
+                            result[entry.path[prefix_len:]] = entry.path
+            except OSError:
+                pass
         return result
 
     def load_file_pair(self, index: int):
         if not 0 <= index < len(self.file_pairs):
             return
         self.current_index = index
-        f1, f2, rel = self.file_pairs[index]
-        c1 = Path(f1).read_text(encoding='utf-8', errors='ignore') if f1 and Path(f1).exists() else ""
-        c2 = Path(f2).read_text(encoding='utf-8', errors='ignore') if f2 and Path(f2).exists() else ""
+        f1, f2, rel, c1, c2, lines1, lines2 = self.file_pairs[index]
+        # Only re-read what the scan didn't keep
+        if c1 is None:
+            c1 = Path(f1).read_text(encoding='utf-8', errors='ignore') if f1 and Path(f1).exists() else ""
+        if c2 is None:
+            c2 = Path(f2).read_text(encoding='utf-8', errors='ignore') if f2 and Path(f2).exists() else ""
         self.original_left, self.original_right = c1, c2
-        self.left_text.delete('1.0', tk.END)
-        self.right_text.delete('1.0', tk.END)
-        self.left_text.insert('1.0', c1)
-        self.right_text.insert('1.0', c2)
-        ext = rel.suffix.lower()
+        # Keep the initial load out of the undo stack so Tk doesn't snapshot whole files
+        for t, content in ((self.left_text, c1), (self.right_text, c2)):
+            t.config(undo=False)
+            t.delete('1.0', tk.END)
+            t.insert('1.0', content)
+            t.edit_reset()
+            t.config(undo=True)
+        ext = os.path.splitext(rel)[1].lower()
         lang = 'python' if ext == '.py' else 'dart' if ext == '.dart' else 'html' if ext in ('.html', '.htm') else None
-        self.apply_syntax(self.left_text, c1, lang)
-        self.apply_syntax(self.right_text, c2, lang)
-        self.highlight_diff(c1, c2)
+        # Syntax colours are applied lazily to the visible lines only
+        self.current_lang = lang
+        for t in (self.left_text, self.right_text):
+            for tag in ('keyword', 'string', 'comment', 'number', 'tag'):
+                t.tag_remove(tag, '1.0', tk.END)
+            self.schedule_highlight(t)
+        self.highlight_diff(c1, c2, lines1, lines2)
         self.update_status()
 
     # ------------------------------------------------------
     # Highlighting
     # ------------------------------------------------------
-    def apply_syntax(self, text_widget, content, lang):
+    def schedule_highlight(self, text_widget):
+        """Debounce viewport highlighting while scrolling or resizing"""
+        job = self.highlight_jobs.pop(text_widget, None)
+        if job:
+            text_widget.after_cancel(job)
+        self.highlight_jobs[text_widget] = text_widget.after(
+            HIGHLIGHT_DELAY_MS, lambda: self.rehighlight_visible(text_widget))
+
+    def rehighlight_visible(self, text_widget):
+        self.highlight_jobs.pop(text_widget, None)
+        first = int(text_widget.index('@0,0').split('.')[0])
+        last = int(text_widget.index(f'@0,{text_widget.winfo_height()}').split('.')[0])
+        scan_first = max(1, first - HIGHLIGHT_MARGIN_LINES)
+        chunk = text_widget.get(f'{scan_first}.0', f'{last + HIGHLIGHT_MARGIN_LINES}.end')
+        self.apply_syntax(text_widget, chunk, self.current_lang, scan_first, (first, last))
+
+    def apply_syntax(self, text_widget, content, lang, first_line=1, view=None):
+        """Highlight content, which starts at first_line of text_widget. If view is a
+        (first, last) line range, only tags inside it are applied, clipped to its edges."""
+        last_line = first_line + content.count('\n')
+        view_first, view_last = view or (first_line, last_line)
         # clear old tags
         for tag in ('keyword', 'string', 'comment', 'number', 'tag'):
-            text_widget.tag_remove(tag, '1.0', tk.END)
-        if not lang or lang not in HIGHLIGHT_RULES:
+            text_widget.tag_remove(tag, f"{view_first}.0", f"{view_last}.end")
+        if not lang or lang not in HIGHLIGHT_PATTERNS:
             return
-        rules = HIGHLIGHT_RULES[lang]
-        for tag, pattern in rules.items():
-            for match in re.finditer(pattern, content, re.MULTILINE):
-                start = f"1.0+{match.start()}c"
-                end = f"1.0+{match.end()}c"
-                text_widget.tag_add(tag, start, end)
-
-    def highlight_diff(self, c1, c2):
+        starts = line_starts(content)
+        # Character offsets of the kept span within content
+        lo = starts[view_first - first_line]
+        hi = starts[view_last - first_line + 1] - 1 if view_last - first_line + 1 < len(starts) else len(content)
+        # Group ranges per tag so each tag is a single Tcl call. Building one Tcl script
+        # of per-range "tag add" commands for tk.eval measured several times slower:
+        # Tcl has to parse every command, while a multi-pair call passes the indices as-is.
+        buckets = defaultdict(list)
+        for match in HIGHLIGHT_PATTERNS[lang].finditer(content):
+            if match.end() <= lo or match.start() >= hi:
+                continue
+            start = offset_to_index(starts, max(match.start(), lo), first_line)
+            end = offset_to_index(starts, min(match.end(), hi), first_line)
+            buckets[match.lastgroup].extend((start, end))
+        for tag, ranges in buckets.items():
+            text_widget.tag_add(tag, *ranges)
+
+    def highlight_diff(self, c1, c2, lines1=None, lines2=None):
         for t in (self.left_text, self.right_text):
             t.tag_remove('diff', '1.0', tk.END)
             t.tag_remove('missing', '1.0', tk.END)
@@ -249,18 +561,26 @@ class DiffViewer:
         if not c2 and c1:
             self.left_text.tag_add('missing', '1.0', tk.END)
             return
-        diff = list(difflib.Differ().compare(c1.splitlines(True), c2.splitlines(True)))
-        l, r = 1, 1
-        for line in diff:
-            if line.startswith('- '):
-                self.left_text.tag_add('diff', f"{l}.0", f"{l}.end")
-                l += 1
-            elif line.startswith('+ '):
-                self.right_text.tag_add('diff', f"{r}.0", f"{r}.end")
-                r += 1
-            elif line.startswith('  '):
-                l += 1
-                r += 1
+        # Only equality and position matter here, so line endings are not needed
+        if lines1 is None:
+            lines1 = c1.splitlines()
+        if lines2 is None:
+            lines2 = c2.splitlines()
+        # Shared leading and trailing lines are unchanged, so only the middle span needs
+        # matching; opcode indices are shifted back by the prefix length.
+        prefix, suffix = common_affix(lines1, lines2)
+        sm = difflib.SequenceMatcher(None, lines1[prefix:len(lines1) - suffix],
+                                     lines2[prefix:len(lines2) - suffix], autojunk=True)
+        left_ranges, right_ranges = [], []
+        for tag, i1, i2, j1, j2 in sm.get_opcodes():
+            if tag in ('delete', 'replace'):
+                left_ranges.extend((f"{prefix + i1 + 1}.0", f"{prefix + i2}.end"))
+            if tag in ('insert', 'replace'):
+                right_ranges.extend((f"{prefix + j1 + 1}.0", f"{prefix + j2}.end"))
+        if left_ranges:
+            self.left_text.tag_add('diff', *left_ranges)
+        if right_ranges:
+            self.right_text.tag_add('diff', *right_ranges)
 
     # ------------------------------------------------------
     # Navigation and Save
@@ -284,19 +604,29 @@ class DiffViewer:
             self.load_file_pair(self.current_index + 1)
 
     def save_left(self):
-        f1, _, rel = self.file_pairs[self.current_index]
+        f1, _, rel = self.file_pairs[self.current_index][:3]
         target = f1 or (self.dir1 / rel)
         Path(target).parent.mkdir(parents=True, exist_ok=True)
         Path(target).write_text(self.left_text.get('1.0', 'end-1c'), encoding='utf-8')
+        self.drop_cached_content()
         messagebox.showinfo("Saved", f"Saved {target}")
 
     def save_right(self):
-        _, f2, rel = self.file_pairs[self.current_index]
+        _, f2, rel = self.file_pairs[self.current_index][:3]
         target = f2 or (self.dir2 / rel)
         Path(target).parent.mkdir(parents=True, exist_ok=True)
         Path(target).write_text(self.right_text.get('1.0', 'end-1c'), encoding='utf-8')
+        self.drop_cached_content()
         messagebox.showinfo("Saved", f"Saved {target}")
 
+    def drop_cached_content(self):
+        """Saved files no longer match the contents captured during the scan"""
+        c1, c2 = self.file_pairs[self.current_index][3:5]
+        if c1 is not None:
+            with self.kept_lock:
+                self.kept_chars -= len(c1) + len(c2)
+        self.file_pairs[self.current_index] = self.file_pairs[self.current_index][:3] + NOT_LOADED
+
     def save_both(self):
         self.save_left()
         self.save_right()